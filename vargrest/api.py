@@ -2,6 +2,7 @@ import itertools
 import json
 import os
 import pathlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Union, Optional, List, Any
 
 from nrresqml.resqml import ResQml
@@ -48,7 +49,7 @@ def estimate_variogram_parameters(settings: Union[str, Dict], output_directory:
     below).
 
     - **summary.csv**: Similar to summary.json, but on a text-based table format. Tecnically not CSV as space is used as
-    separator, not comma, and each column has a fixed width.
+    separator, not comma.
 
     - **vargrest-output-&lt;I&gt;-\\_crop\\_.png** Image indicating the crop box used for execution &lt;I&gt;.
 
@@ -219,10 +220,17 @@ def estimate_variogram_parameters(settings: Union[str, Dict], output_directory:
             # Save crop box figure to file
             rd.plot_crop_box(save_figure=True, dir_name=output_directory, file_name=f"{fn_prefix}_crop_")
 
-            for _fam in families:
-                # Get parametric variogram estimate
-                sigma_wt = weighting['sigma']
-                pe = ve.estimate_parametric_variogram_xyz(ne, family=_fam, nugget=nugget, sigma_wt=sigma_wt)
+            # Get parametric variogram estimates. The per-family fits are independent and dominated by NumPy/SciPy
+            # calls that release the GIL, so they are dispatched to a thread pool. Plotting and file output below
+            # remain sequential since matplotlib figures are not thread-safe.
+            sigma_wt = weighting['sigma']
+            with ThreadPoolExecutor(max_workers=max(1, min(len(families), os.cpu_count() or 1))) as executor:
+                pes = list(executor.map(
+                    lambda _f: ve.estimate_parametric_variogram_xyz(ne, family=_f, nugget=nugget, sigma_wt=sigma_wt),
+                    families
+                ))
+
+            for _fam, pe in zip(families, pes):
                 sp.add_parametric_estimate(pe)
 
                 # Conclude estimation and dump results
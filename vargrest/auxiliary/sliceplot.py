@@ -17,11 +17,20 @@ _VARIOGRAM_MAP = {
 
 class SlicePlot:
     """ Class for generating a slice plot of a grid """
+
+    # Figure allocation is a significant cost in bulk runs, and instances are used one at a time, so the underlying
+    # figure is shared between instances and cleared on re-use
+    _fig_cache = None
+
     def __init__(self, nx, ny, nz, dx, dy, dz) -> None:
         # Generate figure
         self._shape = nx, ny, nz
         self._resolution = dx, dy, dz
-        self._fig = mpl_f.Figure(figsize=(15, 10))
+        if SlicePlot._fig_cache is None:
+            SlicePlot._fig_cache = mpl_f.Figure(figsize=(15, 10))
+        else:
+            SlicePlot._fig_cache.clf()
+        self._fig = SlicePlot._fig_cache
         self._axes = self._fig.subplots(2, 2)
 
     def save(self, filename):
@@ -37,19 +46,31 @@ class SlicePlot:
             pp['r_vertical']['value'],
             pe.raw_parameters()['azi'],
         )
-        par_v = var.create_corr_array(nx, dx, ny, dy, nz, dz)
-        par_v = par_v[
-            nx // 2 + 1:nx // 2 + nx + 1,
-            ny // 2 + 1:ny // 2 + ny + 1,
-            nz // 2 + 1:nz // 2 + nz + 1,
-        ]
-        par_v = (1.0 - par_v) * pp['sigma']['value'] ** 2
-        self._add_slices(par_v, '--', label=f'Param. ({pe.family.value})')
+        # Only the three center lines are plotted, so the parametric variogram is evaluated on those lines directly
+        # instead of on a full 3-D grid that would be discarded
+        x_line, y_line, z_line = var.create_corr_lines(nx, dx, ny, dy, nz, dz)
+        sill = pp['sigma']['value'] ** 2
+        self._add_slice_lines(
+            (1.0 - x_line) * sill,
+            (1.0 - y_line) * sill,
+            (1.0 - z_line) * sill,
+            '--', label=f'Param. ({pe.family.value})'
+        )
 
     def add_non_parametric_estimate(self, ne: NonparametricVariogramEstimate):
         self._add_slices(ne.variogram_map_values(), label='Empirical')
 
     def _add_slices(self, grid, *args, scale=False, **kwargs):
+        assert self._shape == grid.shape
+        nx, ny, nz = self._shape
+        self._add_slice_lines(
+            grid[nx // 2:, ny // 2, nz // 2],
+            grid[nx // 2, ny // 2:, nz // 2],
+            grid[nx // 2, ny // 2, nz // 2:],
+            *args, scale=scale, **kwargs
+        )
+
+    def _add_slice_lines(self, x_line, y_line, z_line, *args, scale=False, **kwargs):
         def _filter_nan(xx, yy):
             return xx[~np.isnan(yy)], yy[~np.isnan(yy)]
 
@@ -60,28 +81,26 @@ class SlicePlot:
             def _scale(xx):
                 return xx
 
-        assert self._shape == grid.shape
-        nx, ny, nz = self._shape
         dx, dy, dz = self._resolution
         # X slice
-        xax = np.arange(0, nx // 2 + 1) * dx
-        yax = _scale(grid[nx // 2:, ny // 2, nz // 2])
+        xax = np.arange(0, x_line.size) * dx
+        yax = _scale(x_line)
         self._axes[0, 0].plot(*_filter_nan(xax, yax), *args, **kwargs)
         self._axes[0, 0].legend()
         self._axes[0, 0].set_title('X-slice')
         self._axes[0, 0].grid()
 
         # Y slice
-        xax = np.arange(0, ny // 2 + 1) * dy
-        yax = _scale(grid[nx // 2, ny // 2:, nz // 2])
+        xax = np.arange(0, y_line.size) * dy
+        yax = _scale(y_line)
         self._axes[0, 1].plot(*_filter_nan(xax, yax), *args, **kwargs)
         self._axes[0, 1].legend()
         self._axes[0, 1].set_title('Y-slice')
         self._axes[0, 1].grid()
 
         # Z slice
-        xax = np.arange(0, nz // 2 + 1) * dz
-        yax = _scale(grid[nx // 2, ny // 2, nz // 2:])
+        xax = np.arange(0, z_line.size) * dz
+        yax = _scale(z_line)
         self._axes[1, 0].plot(*_filter_nan(xax, yax), *args, **kwargs)
         self._axes[1, 0].legend()
         self._axes[1, 0].set_title('Z-slice')
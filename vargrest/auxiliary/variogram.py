@@ -42,6 +42,14 @@ class Variogram:
             c = np.roll(c, shift=tuple(-(s // 2) for s in c.shape), axis=(0, 1, 2))
         return c
 
+    def create_corr_lines(self, nx, dx, ny=1, dy=1.0, nz=1, dz=1.0):
+        # Correlation along the three half-lines from the center out along each axis. Equivalent to slicing those lines
+        # out of create_corr_array, but evaluates O(nx + ny + nz) points instead of a full volume
+        x_line = self._corr(np.arange(0, nx // 2 + 1) * dx)
+        y_line = self._corr(0.0, np.arange(0, ny // 2 + 1) * dy)
+        z_line = self._corr(0.0, 0.0, np.arange(0, nz // 2 + 1) * dz)
+        return x_line, y_line, z_line
+
 
 class ExponentialVariogram(Variogram):
     def _corr_1d(self, d):
@@ -9,12 +9,20 @@ from vargrest.variogramestimation.variogramestimation import NonparametricVariog
 
 
 class VariogramPlot:
+    # Figure allocation is a significant cost in bulk runs, and instances are used one at a time, so the underlying
+    # figure is shared between instances and cleared on re-use
+    _fig_cache = None
+
     def __init__(self,
                  ne: NonparametricVariogramEstimate,
                  pe: ParametricVariogramEstimate,
                  clims: Optional[Tuple[float, float]],
                  red_threshold: Optional[float]) -> None:
-        self._fig = mpl_f.Figure((15, 10))
+        if VariogramPlot._fig_cache is None:
+            VariogramPlot._fig_cache = mpl_f.Figure((15, 10))
+        else:
+            VariogramPlot._fig_cache.clf()
+        self._fig = VariogramPlot._fig_cache
         self._axes = self._fig.subplots(2, 2)
         self._clims = clims
         self._red_threshold = red_threshold
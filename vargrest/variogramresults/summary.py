@@ -1,4 +1,6 @@
+import csv
 import json
+import math
 from enum import Enum
 
 import numpy as np
@@ -62,8 +64,10 @@ def conclude(ve: VariogramEstimator,
              ):
 
     if full_qc is True:
-        # Pickle variogram estimation data
-        pickle.dump((ve, ne), open(os.path.join(qc_dir, fn_template + '_data_.pkl'), 'wb'))
+        # Pickle variogram estimation data. The highest protocol serializes the numpy payloads without the extra
+        # copies of the older default protocol
+        with open(os.path.join(qc_dir, fn_template + '_data_.pkl'), 'wb') as fp:
+            pickle.dump((ve, ne), fp, protocol=pickle.HIGHEST_PROTOCOL)
 
         # Generate slice file
         ve.generate_3d_slice_image(qc_dir, fn_template + '_slices_')
@@ -86,27 +90,25 @@ def dump_variogram_plot(ve: VariogramEstimator,
 
 def dump_summaries_to_csv(summaries: List[ExecutionSummary], csv_file: str):
     csv_values = [s for s in SummaryDataType if s != SummaryDataType.Box]
-    with open(csv_file, 'w') as writer:
-        # Header
-        header = ''.join([f'{f.value:<18.18}' for f in csv_values])
-        writer.write(header.strip() + '\n')
 
-        # Content
-        def _formatter(_s):
-            if isinstance(_s, float):
-                return f'{_s: <17.5}'
-            else:
-                return f'{str(_s):<17.17}'
+    def _formatter(_s):
+        if isinstance(_s, float):
+            return f'{_s:.5}'
+        else:
+            return str(_s)
 
-        for r in summaries:
-            line = ' '.join([_formatter(r[f.value]) for f in csv_values])
-            writer.write(line.strip())
-            writer.write('\n')
+    with open(csv_file, 'w', newline='') as fp:
+        writer = csv.writer(fp, delimiter=' ')
+        writer.writerow([f.value for f in csv_values])
+        writer.writerows([_formatter(r[f.value]) for f in csv_values] for r in summaries)
 
 
 def dump_summaries_to_json(summaries: List[ExecutionSummary], json_file: str):
-    json.dump(summaries, open(json_file, 'w'), indent=2)
-    # Replace 'NaN' with 'null' to comply with JSON specification. This is not a bullet-proof replacement, but
-    # should not be a problem since we have full control of the content of the output file
-    new_jf = open(json_file, 'r').read().replace('NaN', 'null')
-    open(json_file, 'w').write(new_jf)
+    # NaN is not valid JSON, so NaN values are mapped to None (serialized as null) up front. The summaries are flat
+    # dictionaries of scalars, so a shallow walk covers all values and no textual post-processing is needed
+    sanitized = [
+        {k: None if isinstance(v, float) and math.isnan(v) else v for k, v in s.items()}
+        for s in summaries
+    ]
+    with open(json_file, 'w') as fp:
+        json.dump(sanitized, fp, indent=2)